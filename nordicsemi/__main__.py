@@ -1129,13 +1129,20 @@ def port_is_jlink(port):
                    'lower mtu.',
               type=click.IntRange(23, 247, clamp=True),
               default=247)
-def ble(package, conn_ic_id, port, connect_delay, name, address, jlink_snr, flash_connectivity, att_mtu):
+@click.option('-prn', '--packet-receipt-notification',
+              help='Set the packet receipt notification value',
+              type=click.INT,
+              required=False)
+def ble(package, conn_ic_id, port, connect_delay, name, address, jlink_snr, flash_connectivity, att_mtu,
+        packet_receipt_notification):
     """
     Perform a Device Firmware Update on a device with a bootloader that supports BLE DFU.
     This requires a second nRF device, connected to this computer, with connectivity firmware
     loaded. The connectivity device will perform the DFU procedure onto the target device.
     """
     ble_driver_init(conn_ic_id)
+    if packet_receipt_notification is None:
+        packet_receipt_notification = DfuTransportBle.DEFAULT_PRN
     if name is None and address is None:
         name = 'DfuTarg'
         click.echo("No target selected. Default device name: {} is used.".format(name))
@@ -1186,7 +1193,8 @@ def ble(package, conn_ic_id, port, connect_delay, name, address, jlink_snr, flas
     ble_backend = DfuTransportBle(serial_port=str(port),
                                   att_mtu=att_mtu,
                                   target_device_name=str(name),
-                                  target_device_addr=str(address))
+                                  target_device_addr=str(address),
+                                  prn=packet_receipt_notification)
     ble_backend.register_events_callback(DfuEvent.PROGRESS_EVENT, update_progress)
     dfu = Dfu(zip_file_path=package, dfu_transport=ble_backend, connect_delay=connect_delay)
 
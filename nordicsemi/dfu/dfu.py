@@ -37,6 +37,7 @@
 
 # Python standard library
 import os
+import mmap
 import time
 import shutil
 import logging
@@ -44,7 +45,7 @@ import tempfile
 
 
 # Nordic libraries
-from nordicsemi.dfu.package         import Package
+from nordicsemi.dfu.package         import Package, PackageException
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +53,11 @@ logger = logging.getLogger(__name__)
 class Dfu:
     """ Class to handle upload of a new hex image to the device. """
 
+    # Largest init command accepted by the nRF5 SDK bootloaders
+    # (INIT_COMMAND_MAX_SIZE). The limit of the connected target is still
+    # checked by the transport when the command object is selected.
+    INIT_PACKET_MAX_SIZE = 512
+
     def __init__(self, zip_file_path, dfu_transport, connect_delay):
         """
         Initializes the dfu upgrade, unpacks zip and registers callbacks.
@@ -70,6 +76,13 @@ class Dfu:
 
         self.dfu_transport      = dfu_transport
 
+        # Reject oversized init packets before any connection is made.
+        for image in self._images():
+            init_packet_size = os.path.getsize(os.path.join(self.unpacked_zip_path, image.dat_file))
+            if init_packet_size > Dfu.INIT_PACKET_MAX_SIZE:
+                raise PackageException("Init packet {0} is {1} bytes, the maximum is {2} bytes."
+                                       .format(image.dat_file, init_packet_size, Dfu.INIT_PACKET_MAX_SIZE))
+
         if connect_delay is not None:
             self.connect_delay = connect_delay
         else:
@@ -84,24 +97,43 @@ class Dfu:
 
 
     def _dfu_send_image(self, firmware):
+        with open(os.path.join(self.unpacked_zip_path, firmware.dat_file), 'rb') as f:
+            init_packet = f.read()
+
+        with open(os.path.join(self.unpacked_zip_path, firmware.bin_file), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be mapped.
+                image   = f.read()
+            else:
+                # Map the image instead of reading it so that the transports can
+                # slice packets out of it without copying.
+                image   = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if isinstance(image, mmap.mmap) and hasattr(mmap, 'MADV_WILLNEED'):
+            # Have the OS read the image in while connecting and sending the init packet.
+            image.madvise(mmap.MADV_WILLNEED)
+
         time.sleep(self.connect_delay)
         self.dfu_transport.open()
 
         start_time = time.time()
 
         logger.info("Sending init packet...")
-        with open(os.path.join(self.unpacked_zip_path, firmware.dat_file), 'rb') as f:
-            data    = f.read()
-            self.dfu_transport.send_init_packet(data)
+        self.dfu_transport.send_init_packet(init_packet)
 
         logger.info("Sending firmware file...")
-        with open(os.path.join(self.unpacked_zip_path, firmware.bin_file), 'rb') as f:
-            data    = f.read()
-            self.dfu_transport.send_firmware(data)
+        data    = memoryview(image)
+        self.dfu_transport.send_firmware(data)
 
         end_time = time.time()
         logger.info("Image sent in {0}s".format(end_time - start_time))
 
+        # Unmap so that the temporary directory can be removed. On errors the map is
+        # left to the garbage collector, closing it then could raise a BufferError.
+        data.release()
+        if isinstance(image, mmap.mmap):
+            image.close()
+
         self.dfu_transport.close()
 
 
@@ -127,23 +159,15 @@ class Dfu:
             self._dfu_send_image(self.manifest.application)
 
 
-    def dfu_get_total_size(self):
-        total_size = 0
-
-        if self.manifest.softdevice_bootloader:
-            total_size += os.path.getsize(os.path.join(self.unpacked_zip_path,
-                                                       self.manifest.softdevice_bootloader.bin_file))
-
-        if self.manifest.softdevice:
-            total_size += os.path.getsize(os.path.join(self.unpacked_zip_path,
-                                                       self.manifest.softdevice.bin_file))
+    def _images(self):
+        images = [self.manifest.softdevice_bootloader,
+                  self.manifest.softdevice,
+                  self.manifest.bootloader,
+                  self.manifest.application]
 
-        if self.manifest.bootloader:
-            total_size += os.path.getsize(os.path.join(self.unpacked_zip_path,
-                                                       self.manifest.bootloader.bin_file))
+        return [image for image in images if image]
 
-        if self.manifest.application:
-            total_size += os.path.getsize(os.path.join(self.unpacked_zip_path,
-                                                       self.manifest.application.bin_file))
 
-        return total_size
+    def dfu_get_total_size(self):
+        return sum(os.path.getsize(os.path.join(self.unpacked_zip_path, image.bin_file))
+                   for image in self._images())
@@ -38,6 +38,7 @@ import logging
 from abc import ABC, abstractmethod
 
 # Nordic Semiconductor imports
+from pc_ble_driver_py.exceptions import NordicSemiException
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +53,13 @@ class DfuEvent:
     PROGRESS_EVENT = 1
 
 
+class ValidationException(NordicSemiException):
+    """"
+    Exception used when validation failed
+    """
+    pass
+
+
 class DfuTransport(ABC):
     """
     This class as an abstract base class inherited from when implementing transports.
@@ -54,7 +54,7 @@ except ImportError as e:
     raise Exception("Try running 'pip install antlib'.")
 
 # Nordic Semiconductor imports
-from nordicsemi.dfu.dfu_transport   import DfuTransport, DfuEvent, TRANSPORT_LOGGING_LEVEL
+from nordicsemi.dfu.dfu_transport   import DfuTransport, DfuEvent, ValidationException, TRANSPORT_LOGGING_LEVEL
 from pc_ble_driver_py.exceptions    import NordicSemiException
 
 
@@ -81,12 +81,6 @@ def platform_supported():
     return can_run
 
 
-class ValidationException(NordicSemiException):
-    """"
-    Exception used when validation failed
-    """
-    pass
-
 logger = logging.getLogger(__name__)
 
 
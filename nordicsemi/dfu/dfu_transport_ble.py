@@ -43,11 +43,12 @@ import struct
 import logging
 import binascii
 
-from nordicsemi.dfu.dfu_transport   import DfuTransport, DfuEvent
+from nordicsemi.dfu.dfu_transport   import DfuTransport, DfuEvent, ValidationException
 from pc_ble_driver_py.exceptions    import NordicSemiException, IllegalStateException
 from pc_ble_driver_py.ble_driver    import BLEDriver, BLEDriverObserver, BLEEnableParams, BLEUUIDBase, BLEGapSecKDist, BLEGapSecParams, \
     BLEGapIOCaps, BLEUUID, BLEAdvData, BLEGapConnParams, NordicSemiErrorCheck, BLEGapSecStatus, driver
-from pc_ble_driver_py.ble_driver    import ATT_MTU_DEFAULT, BLEConfig, BLEConfigConnGatt, BLEConfigConnGap
+from pc_ble_driver_py.ble_driver    import ATT_MTU_DEFAULT, BLEConfig, BLEConfigConnGatt, BLEConfigConnGap, \
+    BLEConfigConnGattc
 from pc_ble_driver_py.ble_adapter   import BLEAdapter, BLEAdapterObserver, EvtSync
 
 logger  = logging.getLogger(__name__)
@@ -58,13 +59,6 @@ global nrf_sd_ble_api_ver
 nrf_sd_ble_api_ver = config.sd_api_ver_get()
 
 
-class ValidationException(NordicSemiException):
-    """"
-    Exception used when validation failed
-    """
-    pass
-
-
 class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
 
     BASE_UUID = BLEUUIDBase([0x8E, 0xC9, 0x00, 0x00, 0xF3, 0x15, 0x4F, 0x60,
@@ -74,6 +68,8 @@ class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
     BLE_DFU_BUTTONLESS_CHAR_UUID        = BLEUUID(0x0003, BASE_UUID)
     BLE_DFU_BUTTONLESS_BONDED_CHAR_UUID = BLEUUID(0x0004, BASE_UUID)
     SERVICE_CHANGED_UUID                = BLEUUID(0x2A05)
+    BUTTONLESS_UUID_VALUES              = frozenset([BLE_DFU_BUTTONLESS_CHAR_UUID.value,
+                                                     BLE_DFU_BUTTONLESS_BONDED_CHAR_UUID.value])
 
     # Bootloader characteristics
     CP_UUID     = BLEUUID(0x0001, BASE_UUID)
@@ -82,6 +78,10 @@ class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
     CONNECTION_ATTEMPTS   = 3
     ERROR_CODE_POS        = 2
     LOCAL_ATT_MTU         = 247
+    # Number of Write Without Response packets the SoftDevice may have queued
+    # at once. Above one, packets are sent back to back in a connection event
+    # instead of waiting for a TX complete event between them.
+    WRITE_CMD_TX_QUEUE_SIZE = 6
 
     def __init__(self, adapter, bonded=False, keyset=None):
         super().__init__()
@@ -123,6 +123,9 @@ class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
             self.adapter.driver.ble_cfg_set(
                 BLEConfig.conn_gap,
                 BLEConfigConnGap(event_length=5))  # Event length 5 is required for max data length
+            self.adapter.driver.ble_cfg_set(
+                BLEConfig.conn_gattc,
+                BLEConfigConnGattc(write_cmd_tx_queue_size=DFUAdapter.WRITE_CMD_TX_QUEUE_SIZE))
             self.adapter.driver.ble_enable()
 
         self.adapter.driver.ble_vs_uuid_add(DFUAdapter.BASE_UUID)
@@ -171,6 +174,10 @@ class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
             if DFUAdapter.LOCAL_ATT_MTU > ATT_MTU_DEFAULT:
                 logger.info('BLE: Enabling longer ATT MTUs')
                 self.att_mtu = self.adapter.att_mtu_exchange(self.conn_handle, DFUAdapter.LOCAL_ATT_MTU)
+                # att_mtu_exchange() returns the negotiated minimum of both sides,
+                # so data packets are sized from it here and nowhere else.
+                self.packet_size = self.att_mtu - 3
+                logger.info('BLE: Negotiated ATT MTU: {}, packet size: {}'.format(self.att_mtu, self.packet_size))
 
                 logger.info('BLE: Enabling longer Data Length')
                 max_data_length = 251  # Max data length for SD v5
@@ -347,6 +354,8 @@ class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
         self.adapter.write_req(self.conn_handle, DFUAdapter.CP_UUID, data)
 
     def write_data_point(self, data):
+        # Write Without Response, the bootloader acknowledges data through PRN.
+        # data may be any indexable bytes-like object (bytes, memoryview).
         self.adapter.write_cmd(self.conn_handle, DFUAdapter.DP_UUID, data)
 
     def on_gap_evt_sec_params_request(self, ble_driver, conn_handle, peer_params):
@@ -407,15 +416,14 @@ class DFUAdapter(BLEDriverObserver, BLEAdapterObserver):
 
     def on_indication(self, ble_adapter, conn_handle, uuid, data):
         if self.conn_handle         != conn_handle: return
-        if DFUAdapter.BLE_DFU_BUTTONLESS_BONDED_CHAR_UUID.value != uuid.value and \
-           DFUAdapter.BLE_DFU_BUTTONLESS_CHAR_UUID.value != uuid.value:
+        if uuid.value not in DFUAdapter.BUTTONLESS_UUID_VALUES:
             return
         self.indication_q.put(data)
 
     def on_gattc_evt_exchange_mtu_rsp(self, ble_driver, conn_handle, *, status, att_mtu):
-        logger.info('ATT MTU exchanged: conn_handle={} att_mtu={}'.format(conn_handle, att_mtu))
-        self.att_mtu = att_mtu
-        self.packet_size = att_mtu - 3
+        # att_mtu is the server's RX MTU, not the negotiated one. The effective
+        # value and the packet size are set in connect() from att_mtu_exchange().
+        logger.info('ATT MTU exchanged: conn_handle={} server att_mtu={}'.format(conn_handle, att_mtu))
 
 
 class DfuBLEDriver(BLEDriver):
@@ -440,6 +448,21 @@ class DfuTransportBle(DfuTransport):
 
     DEFAULT_TIMEOUT     = 20
     RETRIES_NUMBER      = 3
+    # Data packets are sent as Write Without Response, so a non-zero PRN is
+    # what gives the transfer periodic flow control and CRC checkpoints.
+    DEFAULT_PRN         = 10
+
+    # Reverse lookups used to name op codes and result codes in errors.
+    OP_CODE_NAME        = {value: key for key, value in DfuTransport.OP_CODE.items()}
+    RES_CODE_NAME       = {value: key for key, value in DfuTransport.RES_CODE.items()}
+
+    # Precompiled layouts of control point commands and responses.
+    OP_STRUCT           = struct.Struct('<B')
+    SELECT_STRUCT       = struct.Struct('<BB')
+    PRN_STRUCT          = struct.Struct('<BH')
+    CREATE_STRUCT       = struct.Struct('<BBL')
+    CHECKSUM_RSP_STRUCT = struct.Struct('<II')
+    SELECT_RSP_STRUCT   = struct.Struct('<III')
 
     def __init__(self,
                  serial_port,
@@ -447,7 +470,7 @@ class DfuTransportBle(DfuTransport):
                  target_device_name=None,
                  target_device_addr=None,
                  baud_rate=1000000,
-                 prn=0):
+                 prn=DEFAULT_PRN):
         super().__init__()
         DFUAdapter.LOCAL_ATT_MTU = att_mtu
         self.baud_rate          = baud_rate
@@ -457,6 +480,8 @@ class DfuTransportBle(DfuTransport):
         self.target_device_addr = target_device_addr
         self.dfu_adapter        = None
         self.prn                = prn
+        # Control point commands are packed into this buffer, sized for the longest one.
+        self.cp_buffer          = bytearray(DfuTransportBle.CREATE_STRUCT.size)
 
         self.bonded             = False
         self.keyset             = None
@@ -578,9 +603,13 @@ class DfuTransportBle(DfuTransport):
                 raise NordicSemiException("Failed to send firmware")
             self._send_event(event_type=DfuEvent.PROGRESS_EVENT, progress=len(data))
 
+    def __write_control_point(self, command, *args):
+        command.pack_into(self.cp_buffer, 0, *args)
+        self.dfu_adapter.write_control_point(memoryview(self.cp_buffer)[:command.size])
+
     def __set_prn(self):
         logger.debug("BLE: Set Packet Receipt Notification {}".format(self.prn))
-        self.dfu_adapter.write_control_point([DfuTransportBle.OP_CODE['SetPRN']] + list(struct.pack('<H', self.prn)))
+        self.__write_control_point(DfuTransportBle.PRN_STRUCT, DfuTransportBle.OP_CODE['SetPRN'], self.prn)
         self.__get_response(DfuTransportBle.OP_CODE['SetPRN'])
 
     def __create_command(self, size):
@@ -590,19 +619,19 @@ class DfuTransportBle(DfuTransport):
         self.__create_object(0x02, size)
 
     def __create_object(self, object_type, size):
-        self.dfu_adapter.write_control_point([DfuTransportBle.OP_CODE['CreateObject'], object_type]\
-                                            + list(struct.pack('<L', size)))
+        self.__write_control_point(DfuTransportBle.CREATE_STRUCT, DfuTransportBle.OP_CODE['CreateObject'],
+                                   object_type, size)
         self.__get_response(DfuTransportBle.OP_CODE['CreateObject'])
 
     def __calculate_checksum(self):
-        self.dfu_adapter.write_control_point([DfuTransportBle.OP_CODE['CalcChecSum']])
+        self.__write_control_point(DfuTransportBle.OP_STRUCT, DfuTransportBle.OP_CODE['CalcChecSum'])
         response = self.__get_response(DfuTransportBle.OP_CODE['CalcChecSum'])
 
-        (offset, crc) = struct.unpack('<II', bytearray(response))
+        (offset, crc) = DfuTransportBle.CHECKSUM_RSP_STRUCT.unpack(bytearray(response))
         return {'offset': offset, 'crc': crc}
 
     def __execute(self):
-        self.dfu_adapter.write_control_point([DfuTransportBle.OP_CODE['Execute']])
+        self.__write_control_point(DfuTransportBle.OP_STRUCT, DfuTransportBle.OP_CODE['Execute'])
         self.__get_response(DfuTransportBle.OP_CODE['Execute'])
 
     def __select_command(self):
@@ -613,17 +642,18 @@ class DfuTransportBle(DfuTransport):
 
     def __select_object(self, object_type):
         logger.debug("BLE: Selecting Object: type:{}".format(object_type))
-        self.dfu_adapter.write_control_point([DfuTransportBle.OP_CODE['ReadObject'], object_type])
+        self.__write_control_point(DfuTransportBle.SELECT_STRUCT, DfuTransportBle.OP_CODE['ReadObject'],
+                                   object_type)
         response = self.__get_response(DfuTransportBle.OP_CODE['ReadObject'])
 
-        (max_size, offset, crc)= struct.unpack('<III', bytearray(response))
+        (max_size, offset, crc)= DfuTransportBle.SELECT_RSP_STRUCT.unpack(bytearray(response))
         logger.debug("BLE: Object selected: max_size:{} offset:{} crc:{}".format(max_size, offset, crc))
         return {'max_size': max_size, 'offset': offset, 'crc': crc}
 
     def __get_checksum_response(self):
         response = self.__get_response(DfuTransportBle.OP_CODE['CalcChecSum'])
 
-        (offset, crc) = struct.unpack('<II', bytearray(response))
+        (offset, crc) = DfuTransportBle.CHECKSUM_RSP_STRUCT.unpack(bytearray(response))
         return {'offset': offset, 'crc': crc}
 
     def __stream_data(self, data, crc=0, offset=0):
@@ -636,48 +666,58 @@ class DfuTransportBle(DfuTransport):
                 raise ValidationException('Failed offset validation.\n'\
                                 + 'Expected: {} Received: {}.'.format(offset, response['offset']))
 
+        # CRC is computed per PRN interval over the bytes sent since the last checkpoint.
+        crc_end     = 0
         current_pnr = 0
-        for i in range(0, len(data), self.dfu_adapter.packet_size):
-            to_transmit     = data[i:i + self.dfu_adapter.packet_size]
-            self.dfu_adapter.write_data_point(list(to_transmit))
-            crc     = binascii.crc32(to_transmit, crc) & 0xFFFFFFFF
-            offset += len(to_transmit)
+        packet_size = self.dfu_adapter.packet_size
+        write_data_point = self.dfu_adapter.write_data_point
+        for i in range(0, len(data), packet_size):
+            to_transmit     = data[i:i + packet_size]
+            write_data_point(to_transmit)
             current_pnr    += 1
             if self.prn == current_pnr:
                 current_pnr = 0
+                crc_start, crc_end = crc_end, i + len(to_transmit)
+                crc     = binascii.crc32(data[crc_start:crc_end], crc) & 0xFFFFFFFF
+                offset += crc_end - crc_start
                 response    = self.__get_checksum_response()
                 validate_crc()
 
+        if len(data) > 0 and crc_end == len(data):
+            # The last packet completed a PRN interval, so the checksum has
+            # already been validated.
+            return crc
+
+        crc     = binascii.crc32(data[crc_end:], crc) & 0xFFFFFFFF
+        offset += len(data) - crc_end
         response = self.__calculate_checksum()
         validate_crc()
 
         return crc
 
     def __get_response(self, operation):
-        def get_dict_key(dictionary, value):
-            return next((key for key, val in list(dictionary.items()) if val == value), None)
-
         try:
             resp = self.dfu_adapter.notifications_q.get(timeout=DfuTransportBle.DEFAULT_TIMEOUT)
         except queue.Empty:
-            raise NordicSemiException('Timeout: operation - {}'.format(get_dict_key(DfuTransportBle.OP_CODE,
-                                                                                    operation)))
+            raise NordicSemiException('Timeout: operation - {}'.format(DfuTransportBle.OP_CODE_NAME.get(operation)))
+
+        (response, op_code, res_code) = resp[:3]
 
-        if resp[0] != DfuTransportBle.OP_CODE['Response']:
-            raise NordicSemiException('No Response: 0x{:02X}'.format(resp[0]))
+        if response != DfuTransportBle.OP_CODE['Response']:
+            raise NordicSemiException('No Response: 0x{:02X}'.format(response))
 
-        if resp[1] != operation:
+        if op_code != operation:
             raise NordicSemiException('Unexpected Executed OP_CODE.\n' \
-                                    + 'Expected: 0x{:02X} Received: 0x{:02X}'.format(operation, resp[1]))
+                                    + 'Expected: 0x{:02X} Received: 0x{:02X}'.format(operation, op_code))
 
-        if resp[2] == DfuTransport.RES_CODE['Success']:
+        if res_code == DfuTransport.RES_CODE['Success']:
             return resp[3:]
 
-        elif resp[2] == DfuTransport.RES_CODE['ExtendedError']:
+        elif res_code == DfuTransport.RES_CODE['ExtendedError']:
             try:
                 data = DfuTransport.EXT_ERROR_CODE[resp[3]]
             except IndexError:
                 data = "Unsupported extended error type {}".format(resp[3])
             raise NordicSemiException('Extended Error 0x{:02X}: {}'.format(resp[3], data))
         else:
-            raise NordicSemiException('Response Code {}'.format(get_dict_key(DfuTransport.RES_CODE, resp[2])))
+            raise NordicSemiException('Response Code {}'.format(DfuTransportBle.RES_CODE_NAME.get(res_code)))
@@ -47,18 +47,11 @@ from serial import Serial
 from serial.serialutil import SerialException
 
 # Nordic Semiconductor imports
-from nordicsemi.dfu.dfu_transport   import DfuTransport, DfuEvent, TRANSPORT_LOGGING_LEVEL
+from nordicsemi.dfu.dfu_transport   import DfuTransport, DfuEvent, ValidationException, TRANSPORT_LOGGING_LEVEL
 from pc_ble_driver_py.exceptions    import NordicSemiException
 from nordicsemi.lister.device_lister import DeviceLister
 from nordicsemi.dfu.dfu_trigger import DFUTrigger
 
-class ValidationException(NordicSemiException):
-    """"
-    Exception used when validation failed
-    """
-    pass
-
-
 logger = logging.getLogger(__name__)
 
 class Slip:
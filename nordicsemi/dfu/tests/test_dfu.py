@@ -0,0 +1,179 @@
+#
+# Copyright (c) 2016 Nordic Semiconductor ASA
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#   1. Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above copyright notice, this
+#   list of conditions and the following disclaimer in the documentation and/or
+#   other materials provided with the distribution.
+#
+#   3. Neither the name of Nordic Semiconductor ASA nor the names of other
+#   contributors to this software may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+#   4. This software must only be used in or with a processor manufactured by Nordic
+#   Semiconductor ASA, or in or with a processor manufactured by a third party that
+#   is used in combination with a processor manufactured by Nordic Semiconductor.
+#
+#   5. Any software provided in binary or object form under this license must not be
+#   reverse engineered, decompiled, modified and/or disassembled.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import binascii
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from nordicsemi.dfu.dfu import Dfu
+from nordicsemi.dfu.package import Package, PackageException
+
+
+class TransferError(Exception):
+    pass
+
+
+class FakeTransport:
+    """
+    Slices the firmware into packets and CRCs them like the transports do, and
+    keeps what it received for every image.
+    """
+    PACKET_SIZE = 20
+
+    def __init__(self, fail_after=None):
+        self.fail_after     = fail_after
+        self.init_packets   = []
+        self.images         = []
+        self.crcs           = []
+        self.maps           = []
+        self.is_open        = False
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def send_init_packet(self, init_packet):
+        self.init_packets.append(init_packet)
+
+    def send_firmware(self, firmware):
+        self.maps.append(firmware.obj)
+        received = bytearray()
+        crc      = 0
+        for i in range(0, len(firmware), FakeTransport.PACKET_SIZE):
+            if self.fail_after is not None and len(received) >= self.fail_after:
+                raise TransferError("Target stopped responding")
+            packet    = firmware[i:i + FakeTransport.PACKET_SIZE]
+            received += packet
+            crc       = binascii.crc32(packet, crc) & 0xFFFFFFFF
+        self.images.append(bytes(received))
+        self.crcs.append(crc)
+
+
+class TestDfu(unittest.TestCase):
+    def setUp(self):
+        script_abspath = os.path.abspath(__file__)
+        script_dirname = os.path.dirname(script_abspath)
+        os.chdir(script_dirname)
+
+        self.work_directory = tempfile.mkdtemp(prefix="nrf_dfu_tests_")
+        self.pkg_name = os.path.join(self.work_directory, "mypackage.zip")
+
+        Package(app_version=100,
+                sd_req=[0x1000, 0xfffe],
+                app_fw="firmwares/bar.hex",
+                softdevice_fw="firmwares/foo.hex",
+                bootloader_fw="firmwares/bar.hex",
+                key_file="key.pem").generate_package(self.pkg_name, preserve_work_dir=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_directory, ignore_errors=True)
+
+    def test_total_size(self):
+        dfu = Dfu(self.pkg_name, dfu_transport=None, connect_delay=0)
+
+        expected_size = 0
+        for image in [dfu.manifest.softdevice_bootloader,
+                      dfu.manifest.softdevice,
+                      dfu.manifest.bootloader,
+                      dfu.manifest.application]:
+            if image:
+                expected_size += os.path.getsize(os.path.join(dfu.unpacked_zip_path, image.bin_file))
+
+        self.assertIsNotNone(dfu.manifest.softdevice_bootloader)
+        self.assertIsNotNone(dfu.manifest.application)
+        self.assertEqual(expected_size, dfu.dfu_get_total_size())
+
+    def test_init_packet_too_large(self):
+        with mock.patch.object(Dfu, 'INIT_PACKET_MAX_SIZE', 10):
+            with self.assertRaises(PackageException):
+                Dfu(self.pkg_name, dfu_transport=None, connect_delay=0)
+
+    def test_init_packet_max_size(self):
+        dfu = Dfu(self.pkg_name, dfu_transport=None, connect_delay=0)
+        init_packet_size = max(os.path.getsize(os.path.join(dfu.unpacked_zip_path, image.dat_file))
+                               for image in [dfu.manifest.softdevice_bootloader, dfu.manifest.application])
+
+        with mock.patch.object(Dfu, 'INIT_PACKET_MAX_SIZE', init_packet_size):
+            Dfu(self.pkg_name, dfu_transport=None, connect_delay=0)
+
+    def image_contents(self, dfu):
+        contents = []
+        for image in dfu._images():
+            with open(os.path.join(dfu.unpacked_zip_path, image.bin_file), 'rb') as f:
+                contents.append(f.read())
+        return contents
+
+    def test_send_images(self):
+        transport = FakeTransport()
+        dfu = Dfu(self.pkg_name, dfu_transport=transport, connect_delay=0)
+        dfu.dfu_send_images()
+
+        expected = self.image_contents(dfu)
+        self.assertEqual(expected, transport.images)
+        self.assertEqual([binascii.crc32(image) & 0xFFFFFFFF for image in expected], transport.crcs)
+        self.assertEqual(len(expected), len(transport.init_packets))
+        self.assertTrue(all(image_map.closed for image_map in transport.maps))
+        self.assertFalse(transport.is_open)
+
+    def test_send_empty_image(self):
+        transport = FakeTransport()
+        dfu = Dfu(self.pkg_name, dfu_transport=transport, connect_delay=0)
+        open(os.path.join(dfu.unpacked_zip_path, dfu.manifest.application.bin_file), 'wb').close()
+        dfu.dfu_send_images()
+
+        expected = self.image_contents(dfu)
+        self.assertEqual(b'', expected[-1])
+        self.assertEqual(expected, transport.images)
+        self.assertEqual(0, transport.crcs[-1])
+
+    def test_send_image_transport_error(self):
+        transport = FakeTransport(fail_after=3 * FakeTransport.PACKET_SIZE)
+        dfu = Dfu(self.pkg_name, dfu_transport=transport, connect_delay=0)
+
+        # The transport error must not be replaced by a BufferError from unmapping.
+        with self.assertRaises(TransferError):
+            dfu.dfu_send_images()
+        self.assertEqual([], transport.images)
+
+
+if __name__ == '__main__':
+    unittest.main()
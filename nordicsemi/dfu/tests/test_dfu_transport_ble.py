@@ -0,0 +1,275 @@
+#
+# Copyright (c) 2016 Nordic Semiconductor ASA
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#   1. Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above copyright notice, this
+#   list of conditions and the following disclaimer in the documentation and/or
+#   other materials provided with the distribution.
+#
+#   3. Neither the name of Nordic Semiconductor ASA nor the names of other
+#   contributors to this software may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+#   4. This software must only be used in or with a processor manufactured by Nordic
+#   Semiconductor ASA, or in or with a processor manufactured by a third party that
+#   is used in combination with a processor manufactured by Nordic Semiconductor.
+#
+#   5. Any software provided in binary or object form under this license must not be
+#   reverse engineered, decompiled, modified and/or disassembled.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import binascii
+import queue
+import struct
+import sys
+import types
+import unittest
+from unittest import mock
+
+
+def _stub_modules():
+    """
+    Build just enough of pc_ble_driver_py (and wrapt) to import dfu_transport_ble
+    without a connectivity IC or the native driver.
+    """
+    class NordicSemiException(Exception):
+        pass
+
+    class BLEDriver:
+        api_lock = None
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+    class BLEUUID:
+        def __init__(self, value, base=None):
+            self.value = value
+            self.base  = base
+
+    pc_ble_driver_py    = types.ModuleType('pc_ble_driver_py')
+    exceptions          = types.ModuleType('pc_ble_driver_py.exceptions')
+    ble_driver          = types.ModuleType('pc_ble_driver_py.ble_driver')
+    ble_adapter         = types.ModuleType('pc_ble_driver_py.ble_adapter')
+    config              = types.ModuleType('pc_ble_driver_py.config')
+
+    exceptions.NordicSemiException   = NordicSemiException
+    exceptions.IllegalStateException = NordicSemiException
+
+    for name in ['BLEEnableParams', 'BLEUUIDBase', 'BLEGapSecKDist', 'BLEGapSecParams',
+                 'BLEGapIOCaps', 'BLEAdvData', 'BLEGapConnParams', 'BLEGapSecStatus', 'BLEConfig',
+                 'BLEConfigConnGatt', 'BLEConfigConnGap', 'BLEConfigConnGattc']:
+        setattr(ble_driver, name, mock.MagicMock())
+    ble_driver.BLEDriverObserver    = type('BLEDriverObserver', (), {})
+    ble_driver.BLEDriver            = BLEDriver
+    ble_driver.BLEUUID              = BLEUUID
+    ble_driver.NordicSemiErrorCheck = lambda func: func
+    ble_driver.driver               = mock.MagicMock()
+    ble_driver.ATT_MTU_DEFAULT      = 23
+
+    ble_adapter.BLEAdapter          = mock.MagicMock()
+    ble_adapter.BLEAdapterObserver  = type('BLEAdapterObserver', (), {})
+    ble_adapter.EvtSync             = mock.MagicMock()
+
+    config.sd_api_ver_get           = lambda: 5
+    pc_ble_driver_py.config         = config
+
+    modules = {
+        'pc_ble_driver_py'             : pc_ble_driver_py,
+        'pc_ble_driver_py.exceptions'  : exceptions,
+        'pc_ble_driver_py.ble_driver'  : ble_driver,
+        'pc_ble_driver_py.ble_adapter' : ble_adapter,
+        'pc_ble_driver_py.config'      : config,
+    }
+
+    try:
+        import wrapt
+    except ImportError:
+        wrapt = types.ModuleType('wrapt')
+        wrapt.synchronized = lambda lock: (lambda func: func)
+        modules['wrapt'] = wrapt
+
+    return modules
+
+
+# Import the transport against the stubs only. Everything imported here is
+# dropped from sys.modules again so that other tests see the real modules.
+with mock.patch.dict(sys.modules, _stub_modules()):
+    sys.modules.pop('nordicsemi.dfu.dfu_transport', None)
+    sys.modules.pop('nordicsemi.dfu.dfu_transport_ble', None)
+    from nordicsemi.dfu import dfu_transport_ble
+
+
+class FakeDfuAdapter:
+    """
+    Records data and control point writes and answers checksum requests and
+    packet receipt notifications with the running offset and CRC, like a target.
+    """
+    MAX_OBJECT_SIZE = 4096
+
+    def __init__(self, prn, packet_size, offset=0, crc=0):
+        self.prn                = prn
+        self.packet_size        = packet_size
+        self.offset             = offset
+        self.crc                = crc
+        self.packets            = []
+        self.control_point      = []
+        self.notifications_q    = queue.Queue()
+
+    def write_data_point(self, data):
+        data = bytes(data)
+        self.packets.append(data)
+        self.offset += len(data)
+        self.crc     = binascii.crc32(data, self.crc) & 0xFFFFFFFF
+        if self.prn and len(self.packets) % self.prn == 0:
+            self.__notify_checksum()
+
+    def write_control_point(self, data):
+        data = bytes(data)
+        self.control_point.append(data)
+        if data[0] == dfu_transport_ble.DfuTransportBle.OP_CODE['CalcChecSum']:
+            self.__notify_checksum()
+        elif data[0] == dfu_transport_ble.DfuTransportBle.OP_CODE['ReadObject']:
+            self.__notify(data[0], struct.pack('<III', self.MAX_OBJECT_SIZE, self.offset, self.crc))
+        else:
+            self.__notify(data[0])
+
+    def __notify_checksum(self):
+        self.__notify(dfu_transport_ble.DfuTransportBle.OP_CODE['CalcChecSum'],
+                      struct.pack('<II', self.offset, self.crc))
+
+    def __notify(self, op_code, payload=b''):
+        self.notifications_q.put([dfu_transport_ble.DfuTransportBle.OP_CODE['Response'],
+                                  op_code,
+                                  dfu_transport_ble.DfuTransportBle.RES_CODE['Success']]
+                                 + list(payload))
+
+
+class TestDfuTransportBleControlPoint(unittest.TestCase):
+    def setUp(self):
+        self.transport = dfu_transport_ble.DfuTransportBle(serial_port=None, att_mtu=247, prn=12)
+        self.transport.dfu_adapter = FakeDfuAdapter(prn=12, packet_size=244, offset=0x1234, crc=0xDEADBEEF)
+
+    def test_set_prn(self):
+        self.transport._DfuTransportBle__set_prn()
+
+        self.assertEqual([bytes([0x02] + list(struct.pack('<H', 12)))],
+                         self.transport.dfu_adapter.control_point)
+
+    def test_create_object(self):
+        self.transport._DfuTransportBle__create_command(0x80)
+        self.transport._DfuTransportBle__create_data(0x12345)
+
+        self.assertEqual([bytes([0x01, 0x01] + list(struct.pack('<L', 0x80))),
+                          bytes([0x01, 0x02] + list(struct.pack('<L', 0x12345)))],
+                         self.transport.dfu_adapter.control_point)
+
+    def test_select_object(self):
+        response = self.transport._DfuTransportBle__select_data()
+
+        self.assertEqual([bytes([0x06, 0x02])], self.transport.dfu_adapter.control_point)
+        self.assertEqual({'max_size': FakeDfuAdapter.MAX_OBJECT_SIZE, 'offset': 0x1234, 'crc': 0xDEADBEEF},
+                         response)
+
+    def test_calculate_checksum(self):
+        response = self.transport._DfuTransportBle__calculate_checksum()
+
+        self.assertEqual([bytes([0x03])], self.transport.dfu_adapter.control_point)
+        self.assertEqual({'offset': 0x1234, 'crc': 0xDEADBEEF}, response)
+
+    def test_execute(self):
+        self.transport._DfuTransportBle__execute()
+
+        self.assertEqual([bytes([0x04])], self.transport.dfu_adapter.control_point)
+
+    def test_commands_in_sequence(self):
+        # The buffer is shared, so a short command must not carry bytes of a longer one.
+        self.transport._DfuTransportBle__create_data(0xFFFFFFFF)
+        self.transport._DfuTransportBle__select_command()
+        self.transport._DfuTransportBle__execute()
+
+        self.assertEqual([bytes([0x01, 0x02, 0xFF, 0xFF, 0xFF, 0xFF]), bytes([0x06, 0x01]), bytes([0x04])],
+                         self.transport.dfu_adapter.control_point)
+
+
+class TestDfuTransportBleStreamData(unittest.TestCase):
+    PACKET_SIZE = 20
+
+    def setUp(self):
+        self.data = bytes(range(256)) * 4
+
+    def stream(self, prn, data, crc=0, offset=0):
+        transport = dfu_transport_ble.DfuTransportBle(serial_port=None, att_mtu=247, prn=prn)
+        transport.dfu_adapter = FakeDfuAdapter(prn, self.PACKET_SIZE, offset=offset, crc=crc)
+        result = transport._DfuTransportBle__stream_data(data=memoryview(data), crc=crc, offset=offset)
+        return result, transport.dfu_adapter
+
+    def checksum_requests(self, adapter):
+        calc_checksum = dfu_transport_ble.DfuTransportBle.OP_CODE['CalcChecSum']
+        return len([command for command in adapter.control_point if command[0] == calc_checksum])
+
+    def test_prn_disabled(self):
+        crc, adapter = self.stream(prn=0, data=self.data[:170])
+
+        self.assertEqual(binascii.crc32(self.data[:170]) & 0xFFFFFFFF, crc)
+        self.assertEqual(self.data[:170], b''.join(adapter.packets))
+        self.assertEqual(9, len(adapter.packets))
+        self.assertEqual(1, self.checksum_requests(adapter))
+
+    def test_exact_prn_multiple(self):
+        data = self.data[:4 * 2 * self.PACKET_SIZE]
+        crc, adapter = self.stream(prn=4, data=data)
+
+        self.assertEqual(binascii.crc32(data) & 0xFFFFFFFF, crc)
+        self.assertEqual(data, b''.join(adapter.packets))
+        # The last PRN already validated the object, so no extra checksum request.
+        self.assertEqual(0, self.checksum_requests(adapter))
+
+    def test_partial_last_interval(self):
+        data = self.data[:4 * 2 * self.PACKET_SIZE + 5]
+        crc, adapter = self.stream(prn=4, data=data)
+
+        self.assertEqual(binascii.crc32(data) & 0xFFFFFFFF, crc)
+        self.assertEqual(data, b''.join(adapter.packets))
+        self.assertEqual(1, self.checksum_requests(adapter))
+
+    def test_nonzero_start(self):
+        start_crc = binascii.crc32(self.data[:37]) & 0xFFFFFFFF
+        crc, adapter = self.stream(prn=3, data=self.data[37:300], crc=start_crc, offset=37)
+
+        self.assertEqual(binascii.crc32(self.data[:300]) & 0xFFFFFFFF, crc)
+        self.assertEqual(300, adapter.offset)
+
+    def test_empty_data(self):
+        crc, adapter = self.stream(prn=4, data=b'', crc=0x1234, offset=0)
+
+        self.assertEqual(0x1234, crc)
+        self.assertEqual([], adapter.packets)
+        self.assertEqual(1, self.checksum_requests(adapter))
+
+    def test_crc_mismatch(self):
+        transport = dfu_transport_ble.DfuTransportBle(serial_port=None, att_mtu=247, prn=4)
+        transport.dfu_adapter = FakeDfuAdapter(4, self.PACKET_SIZE, crc=1)
+
+        with self.assertRaises(dfu_transport_ble.ValidationException):
+            transport._DfuTransportBle__stream_data(data=memoryview(self.data[:200]))
+
+
+if __name__ == '__main__':
+    unittest.main()